@@ -3,24 +3,54 @@ import os
 import re
 import time
 import hashlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
+from urllib.parse import urlparse, parse_qsl, urlencode, urljoin, urlunparse
 
 import feedparser
 import requests
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # optional: faster JSON writes
+    orjson = None
+
+try:
+    import fastfeedparser
+except ImportError:  # optional: lxml-based parser, much faster than feedparser
+    fastfeedparser = None
+
 OUTPUT_DIR = "output"
 LOOKBACK_HOURS = 36
+FEED_TIMEOUT = 30
+FEED_CACHE_PATH = os.path.join(OUTPUT_DIR, "_feed_cache.json")
+FEED_HEADERS = {
+    # Only advertise encodings urllib3 can decode here (br/zstd need optional packages).
+    "Accept-Encoding": requests.utils.DEFAULT_ACCEPT_ENCODING,
+    "User-Agent": "ArtificialTribune/1.0",
+}
+PROCESS_POOL_MIN_ENTRIES = int(os.getenv("PROCESS_POOL_MIN_ENTRIES", "20000"))
 
-TRACKING_PARAMS = {"fbclid", "gclid", "ref"}
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "ref"})
 TRACKING_PREFIXES = ("utm_",)
+# Characters urlencode (quote_plus) never escapes.
+_QS_SAFE_RE = re.compile(r"[A-Za-z0-9_.~-]*")
 
 LIVE_UPDATE_PATTERNS = [
     r"\blive updates\b",
     r"\blive blog\b",
     r"\blive\b",
 ]
+_LIVE_RE = re.compile("|".join(LIVE_UPDATE_PATTERNS), re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+# Same character class as _PUNCT_RE, restricted to ASCII so str.translate can take its fast path.
+_ASCII_PUNCT_TABLE = str.maketrans("", "", "".join(c for c in map(chr, range(128)) if _PUNCT_RE.match(c)))
 
 PLAN = {
     "TOP": {"min": 5, "max": 5},
@@ -32,15 +62,13 @@ PLAN = {
     "SPORTS": {"min": 1, "max": 1},
 }
 
-def canonicalize_url(url: str) -> str:
+def _canonicalize_url_full(url: str) -> str:
     try:
         p = urlparse(url)
         q = []
         for k, v in parse_qsl(p.query, keep_blank_values=True):
             kl = k.lower()
-            if kl in TRACKING_PARAMS:
-                continue
-            if any(kl.startswith(prefix) for prefix in TRACKING_PREFIXES):
+            if kl in TRACKING_PARAMS or kl.startswith(TRACKING_PREFIXES):
                 continue
             q.append((k, v))
         new_query = urlencode(q, doseq=True)
@@ -48,28 +76,72 @@ def canonicalize_url(url: str) -> str:
     except Exception:
         return url
 
+@lru_cache(maxsize=4096)
+def canonicalize_url(url: str) -> str:
+    # Fast path: plain string scan. Tokens are kept verbatim only when urlencode would leave
+    # them unchanged, so encoding variants (%20 vs +, café vs caf%C3%A9) still collapse to one id.
+    # Anything urlparse would rewrite (scheme case, ;params, empty host, odd schemes)
+    # takes the full path.
+    if not url.startswith(("https://", "http://")) or url.startswith(("https:///", "http:///")):
+        return _canonicalize_url_full(url)
+    base, sep, query = url.split("#", 1)[0].partition("?")
+    if ";" in base:
+        return _canonicalize_url_full(url)
+    if not sep:
+        return base
+
+    kept = []
+    for token in query.split("&"):
+        if not token:
+            continue
+        key, eq, value = token.partition("=")
+        if not eq or not _QS_SAFE_RE.fullmatch(key):
+            # Bare or encoded keys: let urllib decode them.
+            return _canonicalize_url_full(url)
+        kl = key.lower()
+        if kl in TRACKING_PARAMS or kl.startswith(TRACKING_PREFIXES):
+            continue
+        if not _QS_SAFE_RE.fullmatch(value):
+            return _canonicalize_url_full(url)
+        kept.append(token)
+
+    if not kept:
+        return base
+    return base + "?" + "&".join(kept)
+
+@lru_cache(maxsize=4096)
 def normalize_title(title: str) -> str:
-    t = title.lower().strip()
-    t = re.sub(r"\s+", " ", t)
-    t = re.sub(r"[^\w\s]", "", t)
-    return t
+    t = title.lower()
+    t = t.translate(_ASCII_PUNCT_TABLE) if t.isascii() else _PUNCT_RE.sub("", t)
+    return _WS_RE.sub(" ", t).strip()
 
+@lru_cache(maxsize=4096)
 def stable_id(title: str, url: str) -> str:
     base = normalize_title(title) + "|" + canonicalize_url(url)
-    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:24]
+    # Dedup key, not a security boundary: 12-byte BLAKE2b gives the same 24 hex chars, faster.
+    return hashlib.blake2b(base.encode("utf-8"), digest_size=12).hexdigest()
 
 def looks_like_live_update(title: str) -> bool:
-    t = title.lower()
-    return any(re.search(pat, t) for pat in LIVE_UPDATE_PATTERNS)
+    return _LIVE_RE.search(title) is not None
 
 def parse_entry_datetime(entry):
     tt = entry.get("published_parsed") or entry.get("updated_parsed")
-    if not tt:
+    if tt:
+        return datetime.fromtimestamp(time.mktime(tt), tz=timezone.utc)
+
+    # fastfeedparser has no *_parsed fields; it normalizes dates to ISO 8601 instead.
+    iso = entry.get("published") or entry.get("updated")
+    if not iso:
+        return None
+    try:
+        dt = datetime.fromisoformat(iso)
+    except (TypeError, ValueError):
         return None
-    return datetime.fromtimestamp(time.mktime(tt), tz=timezone.utc)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
 
 def load_categorized_feeds():
-    feeds = []
     with open("feeds.txt", "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
@@ -78,54 +150,163 @@ def load_categorized_feeds():
             if "|" not in line:
                 raise ValueError(f"Bad line in feeds.txt (missing '|'): {line}")
             category, url = line.split("|", 1)
-            feeds.append((category.strip(), url.strip()))
-    return feeds
+            yield category.strip(), url.strip()
 
-def fetch_items():
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=LOOKBACK_HOURS)
-    feeds = load_categorized_feeds()
+def load_feed_cache():
+    if not os.path.exists(FEED_CACHE_PATH):
+        return {}
+    try:
+        with open(FEED_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def parse_feed(content, response_headers=None):
+    if fastfeedparser is not None:
+        try:
+            return fastfeedparser.parse(content)
+        except Exception:
+            pass  # fall back to feedparser, which tolerates more broken feeds
+    # Headers give feedparser the HTTP charset and the base URI for relative links.
+    return feedparser.parse(content, response_headers=response_headers)
+
+def fetch_feed(url, cached=None):
+    """
+    Conditional GET: send the ETag / Last-Modified from the last run and
+    reuse the cached entries on 304 instead of downloading and parsing again.
+    Returns {"etag", "modified", "entries"} with entries already reduced to
+    title / link / published_utc.
+    """
+    headers = dict(FEED_HEADERS)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+
+    r = requests.get(url, headers=headers, timeout=FEED_TIMEOUT)
+    if r.status_code == 304 and cached:
+        return cached
+    r.raise_for_status()
 
-    raw = []
-    for category, url in feeds:
-        feed = feedparser.parse(url)
-        for e in feed.entries:
-            title = (e.get("title") or "").strip()
-            link = (e.get("link") or "").strip()
-            published_dt = parse_entry_datetime(e)
+    hdrs = {k.lower(): v for k, v in r.headers.items()}
+    hdrs.setdefault("content-location", r.url)
+    feed = parse_feed(r.content, response_headers=hdrs)
+    entries = []
+    for e in feed.entries:
+        title = (e.get("title") or "").strip()
+        link = (e.get("link") or "").strip()
+        published_dt = parse_entry_datetime(e)
+        if not title or not link or not published_dt:
+            continue
+        link = urljoin(r.url, link)  # no-op for absolute links; fastfeedparser has no base URI
+        entries.append({
+            "title": title,
+            "link": link,
+            "published_utc": published_dt.isoformat(),
+        })
+
+    return {
+        "etag": r.headers.get("ETag"),
+        "modified": r.headers.get("Last-Modified"),
+        "entries": entries,
+    }
 
-            if not title or not link or not published_dt:
-                continue
-            if published_dt < cutoff:
-                continue
+def _process_entries(category, url, entries, cutoff, dedup=None):
+    # Module-level and plain-data in/out so it can run in a ProcessPoolExecutor worker.
+    # Dedups inline into `dedup` (keeping the newest copy of each story) and only builds
+    # an item dict when the entry wins.
+    if dedup is None:
+        dedup = {}
+    for e in entries:
+        # fetch_feed always stores UTC isoformat() strings, so they order chronologically as-is;
+        # parse only for the cutoff and keep the original string on the item.
+        published_utc = e["published_utc"]
+        if datetime.fromisoformat(published_utc) < cutoff:
+            continue
 
-            c_url = canonicalize_url(link)
-            raw.append({
-                "id": stable_id(title, c_url),
-                "title": title,
-                "url": c_url,
-                "published_utc": published_dt.isoformat(),
-                "category": category,
-                "feed": url,
-                "is_live_update": looks_like_live_update(title),
-            })
+        title = e["title"]
+        c_url = canonicalize_url(e["link"])
+        iid = stable_id(title, c_url)
+        prev = dedup.get(iid)
+        if prev is not None and published_utc <= prev["published_utc"]:
+            continue
 
-    dedup = {}
-    for it in raw:
-        existing = dedup.get(it["id"])
-        if not existing or it["published_utc"] > existing["published_utc"]:
-            dedup[it["id"]] = it
+        dedup[iid] = {
+            "id": iid,
+            "title": title,
+            "url": c_url,
+            "published_utc": published_utc,
+            "category": category,
+            "feed": url,
+            "is_live_update": looks_like_live_update(title),
+        }
+    return dedup
+
+def fetch_items():
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=LOOKBACK_HOURS)
+    workers = int(os.getenv("FEED_WORKERS", "8"))
+
+    # Read all of feeds.txt up front so a bad line fails fast, before any downloads start.
+    feeds = list(load_categorized_feeds())
+
+    old_cache = load_feed_cache()
+    cache = {}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for category, url in feeds:
+            futures.append((executor.submit(fetch_feed, url, old_cache.get(url)), category, url))
+            # Only carry forward feeds still listed in feeds.txt.
+            if url in old_cache:
+                cache[url] = old_cache[url]
+
+        # Merge in feeds.txt order, not completion order: dedup keeps the first copy on a
+        # published-time tie, so earlier feeds (TOP) must win deterministically.
+        for fut, category, url in futures:
+            try:
+                feed = fut.result()
+            except requests.RequestException as ex:
+                print(f"Skipping feed {url}: {ex}")
+                continue
+            cache[url] = feed
+            results.append((category, url, feed))
 
-    items = list(dedup.values())
-    items.sort(key=lambda x: x["published_utc"], reverse=True)
-    return raw, items
+    write_json(FEED_CACHE_PATH, cache, indent=False)
 
-def pick_items(items, category, used_ids, count, avoid_live_updates=True):
+    # Entry processing is pure CPU; only worth worker processes once there are a lot of entries.
+    dedup = {}
+    if sum(len(feed["entries"]) for _, _, feed in results) >= PROCESS_POOL_MIN_ENTRIES:
+        with ProcessPoolExecutor() as executor:
+            per_feed = executor.map(
+                _process_entries,
+                [category for category, _, _ in results],
+                [url for _, url, _ in results],
+                [feed["entries"] for _, _, feed in results],
+                repeat(cutoff),
+            )
+            # Merge the per-feed dedup dicts in feeds.txt order, newest copy wins.
+            for feed_dedup in per_feed:
+                for iid, it in feed_dedup.items():
+                    prev = dedup.get(iid)
+                    if prev is None or it["published_utc"] > prev["published_utc"]:
+                        dedup[iid] = it
+    else:
+        for category, url, feed in results:
+            _process_entries(category, url, feed["entries"], cutoff, dedup)
+
+    # Full sort, not a top-K: items.json keeps every item, and build_lineup needs each
+    # category's complete newest-first order to fill its per-category quotas.
+    items = sorted(dedup.values(), key=itemgetter("published_utc"), reverse=True)
+    return items
+
+def pick_items(items, used_ids, count, avoid_live_updates=True):
+    # items: a single category's bucket, newest first.
     picks = []
     for it in items:
         if it["id"] in used_ids:
             continue
-        if it["category"] != category:
-            continue
         if avoid_live_updates and it.get("is_live_update"):
             continue
         picks.append(it)
@@ -138,20 +319,52 @@ def build_lineup(items):
     used_ids = set()
     lineup = {}
 
-    lineup["TOP"] = pick_items(items, "TOP", used_ids, PLAN["TOP"]["max"], avoid_live_updates=True)
+    # Bucket once by category; items are already sorted newest first, so buckets are too.
+    by_cat = {}
+    for it in items:
+        by_cat.setdefault(it["category"], []).append(it)
+
+    lineup["TOP"] = pick_items(by_cat.get("TOP", []), used_ids, PLAN["TOP"]["max"], avoid_live_updates=True)
 
     for cat in ["US_POLITICS", "FOREIGN_POLICY", "WORLD", "BUSINESS", "TECH", "SPORTS"]:
-        lineup[cat] = pick_items(items, cat, used_ids, PLAN[cat]["max"], avoid_live_updates=True)
+        bucket = by_cat.get(cat, [])
+        lineup[cat] = pick_items(bucket, used_ids, PLAN[cat]["max"], avoid_live_updates=True)
 
         if len(lineup[cat]) < PLAN[cat]["min"]:
-            more = pick_items(items, cat, used_ids, PLAN[cat]["min"] - len(lineup[cat]), avoid_live_updates=False)
+            more = pick_items(bucket, used_ids, PLAN[cat]["min"] - len(lineup[cat]), avoid_live_updates=False)
             lineup[cat].extend(more)
 
     return lineup
 
-def write_json(path, obj):
+def write_json(path, obj, indent=True):
+    # indent=False for machine-read files (items, feed cache): smaller and faster to write.
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=option))
+        return
+
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+        if indent:
+            json.dump(obj, f, indent=2, ensure_ascii=False)
+        else:
+            json.dump(obj, f, separators=(",", ":"), ensure_ascii=False)
+
+def publish_copy(src, dst):
+    # Hardlink when possible (no bytes copied); otherwise copyfile, which uses sendfile on Linux.
+    # Build it under a temp name and swap it in, so dst is never missing or half-written.
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return  # already linked; renaming a link over itself would be a no-op and leave tmp behind
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
 
 def openai_generate_script(lineup, model: str, api_key: str) -> str:
     """
@@ -232,10 +445,10 @@ def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     today = datetime.now().astimezone().strftime("%Y-%m-%d")
 
-    raw, items = fetch_items()
+    items = fetch_items()
 
     items_path = os.path.join(OUTPUT_DIR, f"{today}_items.json")
-    write_json(items_path, items)
+    write_json(items_path, items, indent=False)
 
     lineup = build_lineup(items)
     lineup_path = os.path.join(OUTPUT_DIR, f"{today}_lineup.json")
@@ -277,12 +490,16 @@ def main():
         }
     }
 
-    r = requests.post(tts_url, headers=headers, json=payload, timeout=180)
-    r.raise_for_status()
-
     mp3_path = os.path.join(OUTPUT_DIR, f"{today}.mp3")
-    with open(mp3_path, "wb") as f:
-        f.write(r.content)
+    # Stream to a temp file and swap it in: the publish copies may be hardlinks to mp3_path,
+    # so a failed download must never truncate it in place.
+    tmp_path = mp3_path + ".part"
+    with requests.post(tts_url, headers=headers, json=payload, timeout=180, stream=True) as r:
+        r.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=65536):
+                f.write(chunk)
+    os.replace(tmp_path, mp3_path)
 
     print(f"Wrote MP3:   {mp3_path}")
         # --- Publish-ready copies (stable + dated) ---
@@ -292,15 +509,8 @@ def main():
     latest_path = os.path.join(publish_dir, "latest.mp3")
     dated_path = os.path.join(publish_dir, f"{today}.mp3")
 
-    # Copy bytes (simple and reliable on Windows)
-    with open(mp3_path, "rb") as src:
-        audio_bytes = src.read()
-
-    with open(latest_path, "wb") as dst:
-        dst.write(audio_bytes)
-
-    with open(dated_path, "wb") as dst:
-        dst.write(audio_bytes)
+    publish_copy(mp3_path, latest_path)
+    publish_copy(mp3_path, dated_path)
 
     print(f"Publish latest: {latest_path}")
     print(f"Publish dated:  {dated_path}")